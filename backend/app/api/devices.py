@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+import orjson
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
+from app.core.database import SessionLocal
 from app.dependencies import get_db
 from app.schemas.device import DeviceCreate, DeviceDetailed, DevicePositionSchema
-from app.services import device_service
+from app.services import device_service, position_service
 
 router = APIRouter()
 
+# Se construye una sola vez: evita rearmar el esquema de serialización en cada respuesta
+_positions_adapter = TypeAdapter(List[DevicePositionSchema])
+
 @router.post("/", response_model=DeviceDetailed)
 async def create_device_endpoint(device: DeviceCreate, db: AsyncSession = Depends(get_db)):
     db_device = await device_service.get_device_by_eui(db, device.dev_eui)
@@ -45,4 +53,23 @@ async def read_device_positions(device_id: int, skip: int = 0, limit: int = 100,
     positions = await device_service.get_device_positions(db, device_id, skip=skip, limit=limit)
     if not positions:
         raise HTTPException(status_code=404, detail="No positions found for this device")
-    return positions
+    # Una sola validación sobre toda la lista de filas y JSON serializado directamente
+    # por pydantic-core, sin la revalidación de response_model
+    return Response(
+        content=_positions_adapter.dump_json(_positions_adapter.validate_python(positions)),
+        media_type="application/json"
+    )
+
+async def _positions_ndjson(device_id: int, day: Optional[date]) -> AsyncIterator[bytes]:
+    # Sesión propia: la de get_db se cierra antes de que termine de enviarse el stream
+    async with SessionLocal() as db:
+        async for row in position_service.get_device_positions(db, device_id, day):
+            yield orjson.dumps(row._asdict()) + b"\n"
+
+@router.get("/{device_id}/positions/history")
+async def stream_device_positions(device_id: int, day: Optional[date] = None):
+    """
+    Historial del dispositivo (hasta 1000 posiciones, opcionalmente de un día) en
+    NDJSON, una posición por línea, enviado a medida que se leen las filas.
+    """
+    return StreamingResponse(_positions_ndjson(device_id, day), media_type="application/x-ndjson")
@@ -29,6 +29,11 @@ AU915_PAYLOAD_LIMITS = {
 # Para diseño conservador, usar SF10 como referencia (51 bytes)
 DEFAULT_MAX_PAYLOAD = AU915_PAYLOAD_LIMITS['SF10']
 
+# Formato del polígono comprimido:
+# [tipo:1][ref_lat:4][ref_lng:4][num_puntos:1] + [offset_lat:2][offset_lng:2] * num_puntos
+_COMPRESSED_HEADER_STRUCT = struct.Struct('<BffB')
+_COMPRESSED_OFFSET_STRUCT = struct.Struct('<hh')
+
 # ============================================================================
 # CLASE PARA COMPRESIÓN DE COORDENADAS AU915
 # ============================================================================
@@ -49,7 +54,7 @@ class AU915CoordinateCompressor:
         self.lat_scale_factor = 111000.0  # metros por grado de latitud
         self.lng_scale_factor = 93000.0   # metros por grado de longitud (ajustado para Chile)
         
-        logger.info(f"🇨🇱 Compresor AU915 inicializado - Límite: {max_payload_size} bytes")
+        logger.debug("🇨🇱 Compresor AU915 inicializado - Límite: %d bytes", max_payload_size)
     
     def calculate_reference_point(self, coordinates: List[Dict]) -> Tuple[float, float]:
         """
@@ -58,7 +63,7 @@ class AU915CoordinateCompressor:
         ref_lat = sum(coord['lat'] for coord in coordinates) / len(coordinates)
         ref_lng = sum(coord['lng'] for coord in coordinates) / len(coordinates)
         
-        logger.info(f"📍 Punto de referencia calculado: {ref_lat:.6f}, {ref_lng:.6f}")
+        logger.debug("📍 Punto de referencia calculado: %.6f, %.6f", ref_lat, ref_lng)
         return ref_lat, ref_lng
     
     def validate_coordinates_for_chile(self, coordinates: List[Dict]) -> bool:
@@ -104,23 +109,17 @@ class AU915CoordinateCompressor:
         if num_points < len(coordinates):
             logger.warning(f"⚠️  Limitando polígono de {len(coordinates)} a {num_points} puntos")
         
-        logger.info(f"🔄 Comprimiendo {num_points} puntos para AU915")
+        logger.debug("🔄 Comprimiendo %d puntos para AU915", num_points)
         
         # Calcular punto de referencia (centroide)
         ref_lat, ref_lng = self.calculate_reference_point(coordinates[:num_points])
         
-        # Construir payload comprimido
-        payload = bytearray()
-        
-        # Header: tipo polígono comprimido (1 byte)
-        payload.append(2)  # Tipo 2 = polígono comprimido
-        
-        # Punto de referencia (8 bytes)
-        payload.extend(struct.pack('<f', ref_lat))   # 4 bytes
-        payload.extend(struct.pack('<f', ref_lng))   # 4 bytes
+        # Construir payload comprimido sobre un buffer ya dimensionado
+        payload = bytearray(_COMPRESSED_HEADER_STRUCT.size + _COMPRESSED_OFFSET_STRUCT.size * num_points)
         
-        # Número de puntos (1 byte)
-        payload.append(num_points)
+        # Header: tipo 2 = polígono comprimido, punto de referencia y número de puntos (10 bytes)
+        _COMPRESSED_HEADER_STRUCT.pack_into(payload, 0, 2, ref_lat, ref_lng, num_points)
+        offset = _COMPRESSED_HEADER_STRUCT.size
         
         # Procesar cada punto
         max_offset_error = 0
@@ -140,11 +139,11 @@ class AU915CoordinateCompressor:
             lng_error = abs(lng_offset_meters - lng_offset_int)
             max_offset_error = max(max_offset_error, lat_error, lng_error)
             
-            # Agregar offsets al payload (4 bytes por punto)
-            payload.extend(struct.pack('<h', lat_offset_int))  # 2 bytes
-            payload.extend(struct.pack('<h', lng_offset_int))  # 2 bytes
+            # Escribir offsets en el payload (4 bytes por punto)
+            _COMPRESSED_OFFSET_STRUCT.pack_into(payload, offset, lat_offset_int, lng_offset_int)
+            offset += _COMPRESSED_OFFSET_STRUCT.size
             
-            logger.info(f"   Punto {i+1}: offset_lat={lat_offset_int}m, offset_lng={lng_offset_int}m")
+            logger.debug("   Punto %d: offset_lat=%dm, offset_lng=%dm", i + 1, lat_offset_int, lng_offset_int)
         
         # Agregar group_id si hay espacio
         group_bytes_available = self.max_payload_size - len(payload)
@@ -153,12 +152,15 @@ class AU915CoordinateCompressor:
             payload.extend(group_bytes)
         
         # Logging de resultados
-        logger.info(f"✅ Compresión completada:")
-        logger.info(f"   Tamaño original estimado: {2 + len(coordinates) * 8} bytes")
-        logger.info(f"   Tamaño comprimido: {len(payload)} bytes")
-        logger.info(f"   Reducción: {((2 + len(coordinates) * 8 - len(payload)) / (2 + len(coordinates) * 8) * 100):.1f}%")
-        logger.info(f"   Error máximo de quantización: {max_offset_error:.1f} metros")
-        logger.info(f"   Dentro del límite AU915: {'✅' if len(payload) <= self.max_payload_size else '❌'}")
+        if logger.isEnabledFor(logging.DEBUG):
+            original_size = 2 + len(coordinates) * 8
+            logger.debug(
+                "✅ Compresión completada: %d -> %d bytes (%.1f%%), error máx %.1f m, dentro del límite: %s",
+                original_size, len(payload),
+                (original_size - len(payload)) / original_size * 100,
+                max_offset_error,
+                "✅" if len(payload) <= self.max_payload_size else "❌"
+            )
         
         return payload
     
@@ -12,7 +12,11 @@ class Settings(BaseSettings):
     
     # ChirpStack API (NUEVOS CAMPOS)
     CHIRPSTACK_API_URL: Optional[str] = "http://localhost:8080"
-    CHIRPSTACK_API_TOKEN: Optional[str] = ""
+    # Se lee de la variable de entorno o del .env; nunca dejar el token en el código
+    CHIRPSTACK_API_TOKEN: Optional[str] = None
+    
+    # Logging (DEBUG habilita los volcados de payload por uplink)
+    LOG_LEVEL: str = "INFO"
     
     class Config:
         env_file = ".env"
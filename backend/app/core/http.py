@@ -0,0 +1,38 @@
+import httpx
+import logging
+from typing import Optional
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cliente compartido hacia ChirpStack: reutiliza conexiones keep-alive entre downlinks
+_chirpstack_client: Optional[httpx.AsyncClient] = None
+
+def get_chirpstack_client() -> httpx.AsyncClient:
+    """
+    Retorna el cliente HTTP de ChirpStack, creándolo la primera vez.
+    Ya incluye la URL base y el token, las rutas se pasan relativas.
+    """
+    global _chirpstack_client
+    if _chirpstack_client is None:
+        headers = {}
+        if settings.CHIRPSTACK_API_TOKEN:
+            headers["Authorization"] = f"Bearer {settings.CHIRPSTACK_API_TOKEN}"
+        else:
+            logger.warning(
+                "⚠️ CHIRPSTACK_API_TOKEN no está configurado (variable de entorno o .env): "
+                "ChirpStack rechazará las llamadas a su API"
+            )
+        _chirpstack_client = httpx.AsyncClient(
+            base_url=settings.CHIRPSTACK_API_URL,
+            headers=headers,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=5.0
+        )
+    return _chirpstack_client
+
+async def close_chirpstack_client():
+    global _chirpstack_client
+    if _chirpstack_client is not None:
+        await _chirpstack_client.aclose()
+        _chirpstack_client = None
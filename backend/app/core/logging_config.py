@@ -0,0 +1,21 @@
+import logging
+import logging.handlers
+import queue
+import sys
+
+def setup_logging(level: str = "INFO") -> logging.handlers.QueueListener:
+    """
+    Configura el logger raíz con un QueueHandler.
+    Las corrutinas solo encolan los registros; la escritura a stdout la hace
+    el QueueListener en un hilo aparte, sin bloquear el event loop.
+    """
+    log_queue = queue.SimpleQueue()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level.upper())
+    root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+
+    return logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
@@ -2,10 +2,40 @@ from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from app.api import devices, groups, geofences, integrations 
+from app.core.config import settings
+from app.core.http import get_chirpstack_client, close_chirpstack_client
+from app.core.logging_config import setup_logging
+from app.services import position_queue
 import os
 
 app = FastAPI()
 
+@app.on_event("startup")
+async def start_log_listener():
+    # Se configura al arrancar, no al importar, para no reemplazar los handlers de quien importe app.main
+    app.state.log_listener = setup_logging(settings.LOG_LEVEL)
+    app.state.log_listener.start()
+
+@app.on_event("startup")
+async def start_position_worker():
+    app.state.position_worker = position_queue.start_worker()
+
+@app.on_event("shutdown")
+async def stop_position_worker():
+    await position_queue.stop_worker(app.state.position_worker)
+
+@app.on_event("startup")
+async def open_chirpstack_client():
+    get_chirpstack_client()
+
+@app.on_event("shutdown")
+async def shutdown_chirpstack_client():
+    await close_chirpstack_client()
+
+@app.on_event("shutdown")
+async def stop_log_listener():
+    app.state.log_listener.stop()
+
 app.include_router(devices.router, prefix="/api/v1/devices", tags=["devices"])
 app.include_router(groups.router, prefix="/api/v1/groups", tags=["groups"])
 app.include_router(geofences.router, prefix="/api/v1/geofences", tags=["geofences"])
@@ -35,3 +65,7 @@ async def serve_geofences_js():
 @app.get("/style.css")
 async def serve_style_css():
     return FileResponse(os.path.join("app", "static", "style.css"))
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, loop="uvloop", http="httptools")
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from geoalchemy2 import Geography
+from geoalchemy2.shape import to_shape
 from app.core.database import Base
 
 class DevicePosition(Base):
@@ -9,7 +10,8 @@ class DevicePosition(Base):
     time = Column(DateTime(timezone=True), primary_key=True, default=func.now())
     device_id = Column(Integer, ForeignKey('devices.id'), primary_key=True)
     
-    location = Column(Geography(geometry_type='POINT', srid=4326), nullable=True) 
+    # El índice espacial se declara abajo como SP-GiST (más chico y rápido que GiST para puntos)
+    location = Column(Geography(geometry_type='POINT', srid=4326, spatial_index=False), nullable=True) 
     
     rssi = Column(Integer)
     snr = Column(Float)
@@ -17,18 +19,28 @@ class DevicePosition(Base):
 
     device = relationship("Device", back_populates="positions")
 
+    __table_args__ = (
+        Index("ix_device_positions_location_spgist", "location", postgresql_using="spgist"),
+        # Historial y última posición por dispositivo: filtro por device_id y orden por time DESC
+        Index("ix_device_positions_device_time", "device_id", time.desc()),
+    )
+
+    def _point(self):
+        # latitude y longitude comparten un solo to_shape por cada valor de location
+        if self.location is None:
+            return None
+        cached = self.__dict__.get("_point_cache")
+        if cached is None or cached[0] is not self.location:
+            cached = (self.location, to_shape(self.location))
+            self.__dict__["_point_cache"] = cached
+        return cached[1]
+
     @property
     def latitude(self):
-        if self.location:
-            from geoalchemy2.shape import to_shape
-            point = to_shape(self.location)
-            return point.y
-        return None
+        point = self._point()
+        return point.y if point is not None else None
 
     @property
     def longitude(self):
-        if self.location:
-            from geoalchemy2.shape import to_shape
-            point = to_shape(self.location)
-            return point.x
-        return None
+        point = self._point()
+        return point.x if point is not None else None
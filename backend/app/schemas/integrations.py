@@ -1,5 +1,7 @@
 # app/schemas/integrations.py
-from pydantic import BaseModel
+import binascii
+from dataclasses import dataclass
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List, Dict, Any
 
 class RxInfo(BaseModel):
@@ -20,10 +22,17 @@ class RxInfo(BaseModel):
 class TxInfo(BaseModel):
     """Información de transmisión"""
     frequency: Optional[int] = None
-    modulation: Optional[str] = None
+    modulation: Optional[Any] = None  # "LORA" en v3, objeto {"lora": {...}} en v4
     loRaModulationInfo: Optional[dict] = None
     dr: Optional[int] = None
 
+class DeviceInfo(BaseModel):
+    """Identificación del dispositivo (formato deviceInfo de ChirpStack)"""
+    devEui: Optional[str] = None
+    deviceName: Optional[str] = None
+
+    model_config = ConfigDict(extra="allow")
+
 class GPSLocation(BaseModel):
     """Ubicación GPS decodificada"""
     latitude: Optional[float] = None
@@ -50,7 +59,8 @@ class ChirpstackUplinkPayload(BaseModel):
     applicationID: Optional[str] = None
     applicationName: Optional[str] = None
     deviceName: Optional[str] = None
-    devEUI: str  # Requerido - en Base64
+    devEUI: Optional[str] = None  # En Base64; los eventos nuevos lo traen en deviceInfo
+    deviceInfo: Optional[DeviceInfo] = None
     deviceProfileID: Optional[str] = None
     deviceProfileName: Optional[str] = None
     
@@ -96,13 +106,47 @@ class ChirpstackUplinkPayload(BaseModel):
     object: Optional[Dict[str, Any]] = None
     decoded_content: Optional[Any] = None
     
-    class Config:
-        # Permitir campos adicionales no definidos
-        extra = "allow"
-        # Usar valores de atributos para serialización
-        use_enum_values = True
-        # Permitir mutación del modelo
-        allow_mutation = True
+    # Permitir campos adicionales no definidos y usar valores de enums al serializar.
+    # Los modelos v2 ya son mutables por defecto (allow_mutation ya no existe).
+    model_config = ConfigDict(extra="allow", use_enum_values=True)
+
+class UplinkSignal(BaseModel):
+    """Métricas de señal del primer gateway (loRaSNR en v3, snr en v4)"""
+    rssi: Optional[int] = None
+    loRaSNR: Optional[float] = None
+    snr: Optional[float] = None
+
+class WebhookUplink(BaseModel):
+    """
+    Solo los campos del uplink que lee el webhook. El resto del evento (txInfo,
+    object, tags...) cambia de forma entre ChirpStack v3 y v4 y se ignora sin validar.
+    """
+    devEUI: Optional[str] = None
+    deviceInfo: Optional[DeviceInfo] = None
+    fPort: Optional[int] = None
+    data: Optional[str] = None  # Payload raw en Base64
+    rxInfo: Optional[List[UplinkSignal]] = None
+
+    @property
+    def dev_eui(self) -> str:
+        """DevEUI en hex: deviceInfo.devEui (v4) o devEUI en Base64 (v3)"""
+        if self.deviceInfo and self.deviceInfo.devEui:
+            return self.deviceInfo.devEui
+        if not self.devEUI:
+            return ""
+        if len(self.devEUI) == 16:
+            return self.devEUI  # marshaler json_v3: ya viene en hex
+        try:
+            return binascii.a2b_base64(self.devEUI).hex()
+        except binascii.Error:
+            return self.devEUI
+
+def decode_uplink(raw_body: bytes) -> WebhookUplink:
+    """
+    Valida el cuerpo crudo del webhook directamente con el parser JSON de
+    pydantic-core, sin construir antes un dict de Python intermedio.
+    """
+    return WebhookUplink.model_validate_json(raw_body)
 
 class ChirpstackDownlinkPayload(BaseModel):
     """
@@ -113,7 +157,10 @@ class ChirpstackDownlinkPayload(BaseModel):
     data: str  # Base64
     confirmed: bool = False
     
-class GeofenceUpdate(BaseModel):
+# Los siguientes tipos solo se pasan entre funciones internas (no llegan por HTTP),
+# así que son dataclasses simples sin validación de pydantic.
+@dataclass(slots=True, frozen=True)
+class GeofenceUpdate:
     """
     Actualización de geocerca recibida por downlink.
     """
@@ -123,7 +170,8 @@ class GeofenceUpdate(BaseModel):
     radius: float
     active: bool = True
 
-class DeviceCommand(BaseModel):
+@dataclass(slots=True, frozen=True)
+class DeviceCommand:
     """
     Comandos que se pueden enviar al dispositivo.
     """
@@ -8,6 +8,7 @@ class PositionBase(BaseModel):
     snr: float
 class PositionCreate(PositionBase):
     device_id: int
+    time: Optional[datetime] = None  # Momento de recepción; si falta se usa el de inserción
 class Position(PositionBase):
     time: datetime
     device_id: int
@@ -1,13 +1,15 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, true, text
 from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from app.models.device import Device
 from app.models.position import DevicePosition
-from app.models.group import Group
+from app.models.group import Group, device_group_association
 from app.models.geofence import Geofence
-from app.schemas.device import DeviceCreate, DeviceDetailed, DevicePositionSchema
-from typing import List, Optional, Any
+from app.schemas.device import DeviceCreate, DeviceDetailed
+from app.services import geofence_cache, geofence_geometry
+from typing import List, Optional, Dict, Iterable
 from geoalchemy2 import Geography
 from geoalchemy2.types import Geometry
 
@@ -19,8 +21,11 @@ async def create_device(db: AsyncSession, device: DeviceCreate):
     return db_device
 
 async def get_device_by_eui(db: AsyncSession, dev_eui: str):
+    # dev_eui se guarda siempre en mayúsculas (create_device / enqueue_position), así que
+    # se normaliza el parámetro y la comparación usa el índice único de la columna tal cual,
+    # sin upper() sobre la columna ni índice funcional.
     result = await db.execute(
-        select(Device).where(Device.dev_eui == dev_eui)
+        select(Device).where(Device.dev_eui == dev_eui.upper())
     )
     return result.scalars().first()
 
@@ -31,59 +36,90 @@ async def get_device(db: AsyncSession, device_id: int):
     return result.scalars().first()
 
 async def get_devices(db: AsyncSession, skip: int = 0, limit: int = 100):
+    # Solo lectura para el dashboard: se proyectan columnas sueltas (filas Core),
+    # sin instanciar objetos ORM ni pasar por el identity map.
+
+    # Última posición de cada dispositivo (LATERAL ... LIMIT 1 usa el índice por device_id/time)
+    location_geometry = func.cast(DevicePosition.location, Geometry(srid=4326))
+    last_position_subq = (
+        select(
+            DevicePosition.time,
+            DevicePosition.inside_geofence,
+            func.ST_Y(location_geometry).label("latitude"),
+            func.ST_X(location_geometry).label("longitude")
+        )
+        .where(DevicePosition.device_id == Device.id)
+        .order_by(DevicePosition.time.desc())
+        .limit(1)
+        .correlate(Device)
+        .lateral("last_position")
+    )
+
+    # Nombres de los grupos del dispositivo en un solo arreglo
+    group_names_subq = (
+        select(func.coalesce(func.array_agg(aggregate_order_by(Group.name, Group.id)), text("'{}'")))
+        .join(device_group_association, device_group_association.c.group_id == Group.id)
+        .where(device_group_association.c.device_id == Device.id)
+        .correlate(Device)
+        .scalar_subquery()
+    )
+
+    # Primera geocerca activa entre los grupos del dispositivo
+    group_geofence_subq = (
+        select(Geofence.name)
+        .join(device_group_association, device_group_association.c.group_id == Geofence.group_id)
+        .where(device_group_association.c.device_id == Device.id, Geofence.active == True)
+        .order_by(Geofence.group_id, Geofence.id)
+        .limit(1)
+        .correlate(Device)
+        .lateral("group_geofence")
+    )
+
     stmt = (
-        select(Device)
-        .options(selectinload(Device.groups))
+        select(
+            Device.id,
+            Device.dev_eui,
+            Device.device_name,
+            group_names_subq.label("group_names"),
+            last_position_subq.c.time,
+            last_position_subq.c.inside_geofence,
+            last_position_subq.c.latitude,
+            last_position_subq.c.longitude,
+            group_geofence_subq.c.name.label("geofence_name")
+        )
+        .select_from(Device)
+        .outerjoin(last_position_subq, true())
+        .outerjoin(group_geofence_subq, true())
         .order_by(Device.id)
         .offset(skip)
         .limit(limit)
     )
-    devices_result = await db.execute(stmt)
-    devices = devices_result.scalars().all()
+    result = await db.execute(stmt)
 
     detailed_devices = []
-    for device in devices:
-        last_position_result = await db.execute(
-            select(DevicePosition)
-            .where(DevicePosition.device_id == device.id)
-            .order_by(DevicePosition.time.desc())
-            .limit(1)
-        )
-        last_position = last_position_result.scalars().first()
-
-        group_names = [group.name for group in device.groups]
+    for row in result.mappings():
+        has_position = row["time"] is not None
         geofence_status = "Sin Geocerca"
         associated_geofence_name = "N/A"
 
-        if device.groups:
-            for group in device.groups:
-                geofence_result = await db.execute(
-                    select(Geofence)
-                    .where(Geofence.group_id == group.id, Geofence.active == True)
-                    .limit(1)
-                )
-                group_geofence = geofence_result.scalars().first()
-
-                if group_geofence:
-                    associated_geofence_name = group_geofence.name
-                    if last_position and last_position.location:
-                        # La lógica de 'inside_geofence' se basa en el valor ya guardado en la BD,
-                        # que es actualizado cuando llega un nuevo uplink.
-                        is_inside = last_position.inside_geofence
-                        geofence_status = "Dentro" if is_inside else "Fuera"
-                    else:
-                        geofence_status = "Sin Ubicación"
-                    break
+        if row["geofence_name"] is not None:
+            associated_geofence_name = row["geofence_name"]
+            if has_position and row["latitude"] is not None:
+                # La lógica de 'inside_geofence' se basa en el valor ya guardado en la BD,
+                # que es actualizado cuando llega un nuevo uplink.
+                geofence_status = "Dentro" if row["inside_geofence"] else "Fuera"
+            else:
+                geofence_status = "Sin Ubicación"
 
         detailed_device = DeviceDetailed(
-            id=device.id,
-            dev_eui=device.dev_eui,
-            device_name=device.device_name,
-            group_names=group_names,
-            current_latitude=last_position.latitude if last_position else None,
-            current_longitude=last_position.longitude if last_position else None,
-            current_inside_geofence=last_position.inside_geofence if last_position else None,
-            last_position_time=last_position.time if last_position else None,
+            id=row["id"],
+            dev_eui=row["dev_eui"],
+            device_name=row["device_name"],
+            group_names=list(row["group_names"]),
+            current_latitude=row["latitude"],
+            current_longitude=row["longitude"],
+            current_inside_geofence=row["inside_geofence"],
+            last_position_time=row["time"],
             associated_geofence_name=associated_geofence_name,
             geofence_status=geofence_status
         )
@@ -107,14 +143,87 @@ async def delete_device(db: AsyncSession, device_id: int):
     return True
 
 async def get_device_positions(db: AsyncSession, device_id: int, skip: int = 0, limit: int = 100):
+    # Columnas sueltas con lat/lng ya calculadas en PostGIS: filas Core (mappings) listas
+    # para validarse de una vez en el endpoint, sin objetos ORM ni model_validate por fila
+    location_geometry = func.cast(DevicePosition.location, Geometry(srid=4326))
     result = await db.execute(
-        select(DevicePosition)
+        select(
+            DevicePosition.time,
+            func.ST_Y(location_geometry).label("latitude"),
+            func.ST_X(location_geometry).label("longitude"),
+            DevicePosition.rssi,
+            DevicePosition.snr,
+            DevicePosition.inside_geofence
+        )
         .where(DevicePosition.device_id == device_id)
         .order_by(DevicePosition.time.desc())
         .offset(skip)
         .limit(limit)
     )
-    return [DevicePositionSchema.from_orm(p) for p in result.scalars().all()]
+    return result.mappings().all()
+
+async def get_active_geofences_by_group(db: AsyncSession, group_ids: Iterable[int]) -> Dict[int, Geofence]:
+    """
+    Trae en una sola consulta la primera geocerca activa (menor id) de cada grupo.
+    """
+    group_ids = set(group_ids)
+    if not group_ids:
+        return {}
+
+    result = await db.execute(
+        select(Geofence)
+        .where(Geofence.group_id.in_(group_ids), Geofence.active == True)
+        .order_by(Geofence.group_id, Geofence.id)
+    )
+    geofences_by_group: Dict[int, Geofence] = {}
+    for geofence in result.scalars():
+        geofences_by_group.setdefault(geofence.group_id, geofence)
+    return geofences_by_group
+
+def get_first_active_geofence(device: Device, geofences_by_group: Dict[int, Geofence]) -> Optional[Geofence]:
+    """Primera geocerca activa entre los grupos del dispositivo, o None."""
+    for group in device.groups:
+        group_geofence = geofences_by_group.get(group.id)
+        if group_geofence:
+            return group_geofence
+    return None
+
+def is_circle_geofence(geofence: Geofence) -> bool:
+    return geofence.geofence_type == 'circle' and geofence.radius is not None
+
+async def get_inside_geofence(db: AsyncSession, device: Device, lat: float, lng: float, geofences_by_group: Optional[Dict[int, Geofence]] = None) -> Optional[bool]:
+    """
+    Evalúa el punto contra la primera geocerca activa de los grupos del dispositivo.
+    Retorna None si ningún grupo tiene geocerca. `device.groups` debe venir cargado.
+    Si el dispositivo está detenido y su geocerca no cambió, se reutiliza la última evaluación.
+    `geofences_by_group` permite pasar las geocercas ya precargadas para un lote
+    (ver get_active_geofences_by_group); si no se pasa, se consultan aquí en una sola query.
+    """
+    if geofences_by_group is None:
+        geofences_by_group = await get_active_geofences_by_group(db, (group.id for group in device.groups))
+
+    group_geofence = get_first_active_geofence(device, geofences_by_group)
+    if group_geofence is None:
+        return None
+
+    is_stationary, inside_geofence = await geofence_cache.get_stationary_result(device.id, group_geofence, lat, lng)
+    if is_stationary:
+        return inside_geofence
+
+    if is_circle_geofence(group_geofence):
+        # Los círculos se evalúan en Python (haversine), sin round-trip a PostGIS
+        center_lat, center_lng = geofence_geometry.circle_center(group_geofence)
+        inside_geofence = bool(geofence_geometry.points_in_circles(
+            [lat], [lng], [center_lat], [center_lng], [group_geofence.radius]
+        )[0])
+    elif group_geofence.geofence_type == 'polygon':
+        inside_geofence = geofence_geometry.point_in_polygon(group_geofence, lat, lng)
+    else:
+        # Círculo sin radio u otro tipo: no hay área que evaluar
+        inside_geofence = False
+
+    await geofence_cache.store_result(device.id, group_geofence, lat, lng, inside_geofence)
+    return inside_geofence
 
 async def add_device_position(db: AsyncSession, device_id: int, lat: float, lng: float, alt: Optional[float], rssi: Optional[int], snr: Optional[float], gps_valid: Optional[bool]):
     point = func.ST_SetSRID(func.ST_Point(lng, lat), 4326).cast(Geography)
@@ -122,18 +231,8 @@ async def add_device_position(db: AsyncSession, device_id: int, lat: float, lng:
     inside_geofence = None
     if gps_valid and lat != 0.0 and lng != 0.0:
         device = await get_device(db, device_id)
-        if device and device.groups:
-            for group in device.groups:
-                geofence_result = await db.execute(
-                    select(Geofence)
-                    .where(Geofence.group_id == group.id, Geofence.active == True)
-                    .limit(1)
-                )
-                group_geofence = geofence_result.scalars().first()
-
-                if group_geofence:
-                    inside_geofence = await check_point_in_geofence(db, point, group_geofence)
-                    break
+        if device:
+            inside_geofence = await get_inside_geofence(db, device, lat, lng)
 
     db_position = DevicePosition(
         device_id=device_id,
@@ -146,22 +245,3 @@ async def add_device_position(db: AsyncSession, device_id: int, lat: float, lng:
     await db.commit()
     await db.refresh(db_position)
     return db_position
-
-async def check_point_in_geofence(db: AsyncSession, point_geography: Any, geofence: Geofence) -> bool:
-    point_as_geometry = func.cast(point_geography, Geometry)
-    geofence_as_geometry = func.cast(geofence.geometry, Geometry)
-
-    query = None
-    if geofence.geofence_type == 'circle' and geofence.radius is not None:
-        query = select(func.ST_DWithin(point_as_geometry, geofence_as_geometry, geofence.radius))
-    
-    elif geofence.geofence_type == 'polygon':
-        query = select(func.ST_Contains(geofence_as_geometry, point_as_geometry))
-
-    if query is None:
-        return False
-
-    result = await db.execute(query)
-    is_inside = result.scalar_one_or_none()
-    
-    return is_inside or False
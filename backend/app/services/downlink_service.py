@@ -1,12 +1,14 @@
 import struct
-import base64
-import aiohttp
+import binascii
 import logging
 from typing import Optional
-from app.core.config import settings
+from app.core.http import get_chirpstack_client
 
 logger = logging.getLogger(__name__)
 
+# Formato: [CMD][LAT_4bytes][LNG_4bytes][RADIUS_2bytes]
+_GEOFENCE_DOWNLINK_STRUCT = struct.Struct('<BiiH')
+
 async def send_geofence_to_device(dev_eui: str, lat: float, lng: float, radius: int) -> bool:
     """
     Envía una geocerca circular al dispositivo vía downlink.
@@ -17,19 +19,16 @@ async def send_geofence_to_device(dev_eui: str, lat: float, lng: float, radius:
         lat_int = int(lat * 10000000)
         lng_int = int(lng * 10000000)
         
-        payload = struct.pack('<BiihH', 
-                             0x02,  # Comando
-                             lat_int,  # Latitud
-                             lng_int,  # Longitud  
-                             radius)  # Radio
+        payload = _GEOFENCE_DOWNLINK_STRUCT.pack(
+            0x02,  # Comando
+            lat_int,  # Latitud
+            lng_int,  # Longitud
+            radius  # Radio
+        )
         
-        payload_b64 = base64.b64encode(payload).decode('utf-8')
+        payload_b64 = binascii.b2a_base64(payload, newline=False).decode('ascii')
         
-        url = f"{settings.CHIRPSTACK_API_URL}/api/devices/{dev_eui}/queue"
-        headers = {
-            "Grpc-Metadata-Authorization": f"Bearer {settings.CHIRPSTACK_API_TOKEN}",
-            "Content-Type": "application/json"
-        }
+        url = f"/api/devices/{dev_eui}/queue"
         
         data = {
             "deviceQueueItem": {
@@ -40,15 +39,14 @@ async def send_geofence_to_device(dev_eui: str, lat: float, lng: float, radius:
             }
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=data, headers=headers) as response:
-                if response.status == 200:
-                    logger.info(f"✅ Geocerca enviada a {dev_eui}: {lat:.6f},{lng:.6f} R:{radius}m")
-                    return True
-                else:
-                    logger.error(f"❌ Error enviando geocerca: {response.status}")
-                    return False
-                    
+        response = await get_chirpstack_client().post(url, json=data)
+        if response.status_code == 200:
+            logger.info("✅ Geocerca enviada a %s: %.6f,%.6f R:%sm", dev_eui, lat, lng, radius)
+            return True
+        else:
+            logger.error("❌ Error enviando geocerca: %s", response.status_code)
+            return False
+            
     except Exception as e:
-        logger.error(f"❌ Excepción enviando geocerca: {e}")
+        logger.error("❌ Excepción enviando geocerca: %s", e)
         return False
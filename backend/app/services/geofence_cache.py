@@ -0,0 +1,53 @@
+import asyncio
+import math
+from typing import Any, Dict, Optional, Tuple
+from app.models.geofence import Geofence
+
+# Desplazamiento bajo el cual se reutiliza la última evaluación (~5 metros en grados)
+STATIONARY_RADIUS_DEG = 5.0 / 111320.0
+_STATIONARY_RADIUS_DEG_SQ = STATIONARY_RADIUS_DEG * STATIONARY_RADIUS_DEG
+
+# device_id -> (versión de la geocerca, lat, lng, inside_geofence) de la última evaluación completa
+_last_evaluation: Dict[int, Tuple[Any, float, float, Optional[bool]]] = {}
+_lock = asyncio.Lock()
+
+def _geofence_version(geofence: Geofence) -> Tuple[Any, ...]:
+    """
+    Identifica la geocerca tal como se evaluó. Si se edita (en este proceso, en otro
+    worker de uvicorn o mientras se evaluaba un lote), la geocerca que se lee después
+    ya no coincide y el resultado guardado se descarta.
+    """
+    return geofence.id, geofence.geofence_type, geofence.radius, geofence.geometry.data
+
+async def get_stationary_result(device_id: int, geofence: Geofence, lat: float, lng: float) -> Tuple[bool, Optional[bool]]:
+    """
+    Retorna (True, inside_geofence) si el dispositivo no se ha movido más de
+    ~5 m desde la última evaluación contra esta misma geocerca; (False, None) si
+    hay que evaluar de nuevo. Usa la aproximación equirectangular, suficiente a estas distancias.
+    """
+    async with _lock:
+        last = _last_evaluation.get(device_id)
+    if last is None:
+        return False, None
+
+    version, lat0, lng0, inside_geofence = last
+    if version != _geofence_version(geofence):
+        return False, None
+    dx = (lng - lng0) * math.cos(math.radians(lat0))
+    dy = lat - lat0
+    if dx * dx + dy * dy < _STATIONARY_RADIUS_DEG_SQ:
+        return True, inside_geofence
+    return False, None
+
+async def store_result(device_id: int, geofence: Geofence, lat: float, lng: float, inside_geofence: Optional[bool]):
+    """Guarda el resultado junto con la versión de la geocerca contra la que se evaluó."""
+    async with _lock:
+        _last_evaluation[device_id] = (_geofence_version(geofence), lat, lng, inside_geofence)
+
+async def invalidate():
+    """
+    Descarta las evaluaciones de este proceso cuando cambian geocercas o grupos. Cada
+    resultado ya queda ligado a su geocerca, así que esto solo libera entradas obsoletas.
+    """
+    async with _lock:
+        _last_evaluation.clear()
@@ -0,0 +1,49 @@
+import numpy as np
+import shapely
+from typing import Any, Dict, Tuple
+from geoalchemy2.shape import to_shape
+from app.models.geofence import Geofence
+
+# Radio medio de la Tierra (IUGG), el mismo que usa la esfera de PostGIS
+EARTH_RADIUS_M = 6371008.8
+
+# geofence_id -> (WKB con que se construyó, polígono preparado)
+_prepared_polygons: Dict[int, Tuple[Any, Any]] = {}
+
+def circle_center(geofence: Geofence) -> Tuple[float, float]:
+    """Retorna (lat, lng) del centro de una geocerca circular."""
+    point = to_shape(geofence.geometry)
+    return point.y, point.x
+
+def points_in_circles(lats, lngs, center_lats, center_lngs, radii_m) -> np.ndarray:
+    """
+    Evalúa de una vez N puntos contra N círculos (elemento a elemento) con la
+    distancia haversine, sin pasar por PostGIS. Retorna un arreglo de bool.
+    """
+    lat1 = np.radians(np.asarray(lats, dtype=np.float64))
+    lat2 = np.radians(np.asarray(center_lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(center_lngs, dtype=np.float64) - np.asarray(lngs, dtype=np.float64))
+
+    h = np.sin(dlat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2.0) ** 2
+    distance_m = 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+    return distance_m <= np.asarray(radii_m, dtype=np.float64)
+
+def _prepared_polygon(geofence: Geofence):
+    """
+    Polígono de Shapely con sus índices internos ya construidos (shapely.prepare),
+    reutilizado entre uplinks. Si la geocerca cambió, su WKB ya no coincide y se
+    vuelve a preparar.
+    """
+    cached = _prepared_polygons.get(geofence.id)
+    if cached is not None and cached[0] == geofence.geometry.data:
+        return cached[1]
+
+    polygon = to_shape(geofence.geometry)
+    shapely.prepare(polygon)
+    _prepared_polygons[geofence.id] = (geofence.geometry.data, polygon)
+    return polygon
+
+def point_in_polygon(geofence: Geofence, lat: float, lng: float) -> bool:
+    """Equivale al ST_Contains sobre geometry que se hacía en PostGIS (planar, en grados)."""
+    return bool(shapely.contains_xy(_prepared_polygon(geofence), lng, lat))
@@ -1,26 +1,29 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
 from app.models.geofence import Geofence
 from app.schemas.geofence import GeofenceCreate, GeofenceType
-from shapely.geometry import Polygon, Point
-from geoalchemy2.elements import WKBElement
-from geoalchemy2.shape import to_shape, from_shape
-from typing import List, Dict, Any
+from app.services import geofence_cache
+from geoalchemy2.elements import WKTElement
+from typing import Optional
 
-async def create_geofence(db: AsyncSession, geofence_in: GeofenceCreate):
-    geometry = None
+def _build_geometry(geofence_in: GeofenceCreate) -> Optional[WKTElement]:
+    """
+    Construye la geometría de la geocerca como WKT (polígono o centro del círculo).
+    La parsea PostGIS (se envía como parámetro), sin crear objetos de Shapely.
+    """
     if geofence_in.geofence_type == GeofenceType.POLYGON:
         coords = [(p.lng, p.lat) for p in geofence_in.coordinates]
         if coords and coords[0] != coords[-1]:
             coords.append(coords[0])
-        polygon = Polygon(coords)
-        geometry = from_shape(polygon, srid=4326)
+        ring = ", ".join(f"{lng!r} {lat!r}" for lng, lat in coords)
+        return WKTElement(f"POLYGON(({ring}))", srid=4326)
     elif geofence_in.geofence_type == GeofenceType.CIRCLE:
         center_coords = geofence_in.coordinates
-        point = Point(center_coords.lng, center_coords.lat)
-        geometry = from_shape(point, srid=4326)
-    
+        return WKTElement(f"POINT({center_coords.lng!r} {center_coords.lat!r})", srid=4326)
+    return None
+
+async def create_geofence(db: AsyncSession, geofence_in: GeofenceCreate):
+    geometry = _build_geometry(geofence_in)
     if geometry is None:
         raise ValueError("Invalid geometry for geofence type")
 
@@ -35,6 +38,7 @@ async def create_geofence(db: AsyncSession, geofence_in: GeofenceCreate):
     db.add(db_geofence)
     await db.commit()
     await db.refresh(db_geofence)
+    await geofence_cache.invalidate()
     return db_geofence
 
 async def get_geofence(db: AsyncSession, geofence_id: int):
@@ -60,18 +64,7 @@ async def update_geofence(db: AsyncSession, geofence_id: int, geofence_update: G
     if not db_geofence:
         return None
 
-    geometry = None
-    if geofence_update.geofence_type == GeofenceType.POLYGON:
-        coords = [(p.lng, p.lat) for p in geofence_update.coordinates]
-        if coords and coords[0] != coords[-1]:
-            coords.append(coords[0])
-        polygon = Polygon(coords)
-        geometry = from_shape(polygon, srid=4326)
-    elif geofence_update.geofence_type == GeofenceType.CIRCLE:
-        center_coords = geofence_update.coordinates
-        point = Point(center_coords.lng, center_coords.lat)
-        geometry = from_shape(point, srid=4326)
-
+    geometry = _build_geometry(geofence_update)
     if geometry is None:
         raise ValueError("Invalid geometry for geofence type on update")
 
@@ -83,6 +76,7 @@ async def update_geofence(db: AsyncSession, geofence_id: int, geofence_update: G
     db_geofence.active = geofence_update.active 
     await db.commit()
     await db.refresh(db_geofence)
+    await geofence_cache.invalidate()
     return db_geofence
 
 async def delete_geofence(db: AsyncSession, geofence_id: int):
@@ -90,4 +84,5 @@ async def delete_geofence(db: AsyncSession, geofence_id: int):
     if db_geofence:
         await db.delete(db_geofence)
         await db.commit()
+        await geofence_cache.invalidate()
     return db_geofence
@@ -1,32 +1,48 @@
 import struct
-from typing import Optional, Dict, Any
+import binascii
+import logging
+import numpy as np
+from typing import Optional, Dict, Any, Union
 
-def decode_gps_payload(payload_hex: str) -> Optional[Dict[str, Any]]:
+logger = logging.getLogger(__name__)
+
+# Formato del collar: [lat:4][lng:4][alt:2][sats:1][bat:1][hdop:1][alert:1][flags:1]
+_GPS_STRUCT = struct.Struct('<iihBBBBB')
+
+# Niveles de alerta indexados por el código que envía el collar
+_ALERT_LEVELS = ("SAFE", "WARNING", "CAUTION", "DANGER", "EMERGENCY")
+
+# Mismo formato como dtype estructurado (sin padding, 15 bytes por registro)
+_GPS_DTYPE = np.dtype([
+    ('lat', '<i4'),
+    ('lng', '<i4'),
+    ('alt', '<i2'),
+    ('sats', 'u1'),
+    ('bat', 'u1'),
+    ('hdop', 'u1'),
+    ('alert', 'u1'),
+    ('flags', 'u1')
+])
+
+def decode_gps_payload(payload: Union[bytes, str]) -> Optional[Dict[str, Any]]:
     """
     Decodifica payload GPS del collar LoRaWAN
     Formato: [lat:4][lng:4][alt:2][sats:1][bat:1][hdop:1][alert:1][flags:1]
-    Total: 15 bytes
+    Total: 15 bytes. Acepta los bytes crudos (p. ej. binascii.a2b_base64 del
+    campo `data` del uplink) o, por compatibilidad, un string hex.
     """
     try:
-        # Limpiar el hex string por si tiene espacios o caracteres extraños
-        payload_hex = payload_hex.strip().replace(" ", "")
-        
-        # Verificar longitud del hex (debe ser 30 caracteres para 15 bytes)
-        if len(payload_hex) != 30:
-            print(f"❌ Payload hex incorrecto: {len(payload_hex)} chars (esperados 30)")
-            return None
-        
-        # Convertir hex a bytes
-        payload_bytes = bytes.fromhex(payload_hex)
+        if isinstance(payload, str):
+            payload_bytes = binascii.a2b_hex(payload.strip().replace(" ", ""))
+        else:
+            payload_bytes = payload
         
-        if len(payload_bytes) != 15:
-            print(f"❌ Payload incorrecto: {len(payload_bytes)} bytes (esperados 15)")
+        if len(payload_bytes) != _GPS_STRUCT.size:
+            logger.warning("❌ Payload incorrecto: %d bytes (esperados %d)", len(payload_bytes), _GPS_STRUCT.size)
             return None
         
         # Desempaquetar según formato del collar
-        lat_raw, lng_raw, alt, sats, bat, hdop_raw, alert, flags = struct.unpack(
-            '<iihBBBBB', payload_bytes
-        )
+        lat_raw, lng_raw, alt, sats, bat, hdop_raw, alert, flags = _GPS_STRUCT.unpack(payload_bytes)
         
         # Convertir coordenadas (vienen multiplicadas por 10^7)
         latitude = lat_raw / 10000000.0
@@ -37,21 +53,15 @@ def decode_gps_payload(payload_hex: str) -> Optional[Dict[str, Any]]:
         gps_valid = bool(flags & 0x01)
         inside_geofence = bool(flags & 0x02)
         
-        # Mapear niveles de alerta
-        alert_levels = {
-            0: "SAFE",
-            1: "WARNING", 
-            2: "CAUTION",
-            3: "DANGER",
-            4: "EMERGENCY"
-        }
+        # Mapear nivel de alerta
+        alert_name = _ALERT_LEVELS[alert] if alert < len(_ALERT_LEVELS) else "UNKNOWN"
         
-        print(f"✅ GPS Decodificado:")
-        print(f"    📍 Lat: {latitude:.7f}, Lng: {longitude:.7f}")
-        print(f"    🏔️ Alt: {alt}m, Sats: {sats}")
-        print(f"    🔋 Bat: {bat}%, HDOP: {hdop}")
-        print(f"    🚨 Alert: {alert_levels.get(alert, 'UNKNOWN')}")
-        print(f"    ✅ GPS: {gps_valid}, Geofence: {inside_geofence}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "✅ GPS %.7f,%.7f alt=%d sats=%d bat=%d hdop=%.1f alert=%s valid=%s geo=%s",
+                latitude, longitude, alt, sats, bat, hdop,
+                alert_name, gps_valid, inside_geofence
+            )
         
         return {
             "gpsLocation": {
@@ -62,12 +72,34 @@ def decode_gps_payload(payload_hex: str) -> Optional[Dict[str, Any]]:
             "satellites": sats,
             "battery": bat,
             "hdop": hdop,
-            "alert": alert_levels.get(alert, "UNKNOWN"),
+            "alert": alert_name,
             "gps_valid": gps_valid,
             "inside_geofence": inside_geofence
         }
         
     except Exception as e:
-        print(f"❌ Error decodificando payload: {e}")
-        print(f"    Hex recibido: {payload_hex}")
+        logger.error("❌ Error decodificando payload %r: %s", payload, e)
+        return None
+
+def decode_gps_batch(buffer: bytes) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Decodifica de una vez varios payloads GPS de 15 bytes concatenados
+    (reproceso de logs o lotes de uplinks). Retorna un arreglo por campo,
+    con las mismas conversiones que decode_gps_payload.
+    """
+    if len(buffer) % _GPS_DTYPE.itemsize != 0:
+        logger.warning("❌ Lote incorrecto: %d bytes no es múltiplo de %d", len(buffer), _GPS_DTYPE.itemsize)
         return None
+
+    packets = np.frombuffer(buffer, dtype=_GPS_DTYPE)
+    return {
+        "latitude": packets['lat'] / 10000000.0,
+        "longitude": packets['lng'] / 10000000.0,
+        "altitude": packets['alt'],
+        "satellites": packets['sats'],
+        "battery": packets['bat'],
+        "hdop": packets['hdop'] / 10.0,
+        "alert": packets['alert'],
+        "gps_valid": (packets['flags'] & 0x01).astype(bool),
+        "inside_geofence": (packets['flags'] & 0x02).astype(bool)
+    }
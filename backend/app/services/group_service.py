@@ -5,6 +5,7 @@ from app.models.group import Group
 from app.models.device import Device # Asegúrate de importar Device para la carga anidada
 from app.models.geofence import Geofence # Asegúrate de importar Geofence
 from app.schemas.group import GroupCreate
+from app.services import geofence_cache
 from typing import List
 
 async def create_group(db: AsyncSession, group: GroupCreate):
@@ -85,6 +86,7 @@ async def update_group(db: AsyncSession, group_id: int, group_update: GroupCreat
             
         await db.commit()
         await db.refresh(db_group)
+        await geofence_cache.invalidate()
     return db_group
 
 async def delete_group(db: AsyncSession, group_id: int):
@@ -95,4 +97,5 @@ async def delete_group(db: AsyncSession, group_id: int):
     if db_group:
         await db.delete(db_group)
         await db.commit()
+        await geofence_cache.invalidate()
     return db_group
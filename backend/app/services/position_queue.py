@@ -0,0 +1,217 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+from app.core.database import SessionLocal
+from app.models.device import Device
+from app.schemas.position import PositionCreate
+from app.services import device_service, geofence_cache, geofence_geometry, position_service
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUE_SIZE = 1000
+MAX_BATCH_SIZE = 200
+# Tiempo máximo que se espera a juntar más posiciones tras recibir la primera del lote
+MAX_BATCH_WAIT = 0.05  # segundos
+# Tiempo máximo que el apagado espera a que se guarde lo que quedó en la cola
+SHUTDOWN_TIMEOUT = 10.0  # segundos
+
+class QueuedPosition(NamedTuple):
+    dev_eui: str
+    time: datetime
+    lat: float
+    lng: float
+    rssi: Optional[int]
+    snr: Optional[float]
+    gps_valid: bool
+
+_queue: "asyncio.Queue[QueuedPosition]" = asyncio.Queue(maxsize=MAX_QUEUE_SIZE)
+# Avisa al worker que hay posiciones nuevas (o que debe apagarse). El worker solo saca
+# de la cola con get_nowait(), así que cancelar una espera nunca pierde una posición.
+# Lo crea start_worker() dentro del loop en que corre el worker.
+_items_available: Optional[asyncio.Event] = None
+_shutting_down = False
+
+def enqueue_position(dev_eui: str, lat: float, lng: float, rssi: Optional[int], snr: Optional[float], gps_valid: bool) -> bool:
+    """
+    Encola una posición recibida por uplink. El tiempo se fija al recibirla,
+    no al insertarla, para que dos uplinks del mismo lote no colisionen en la PK.
+    """
+    try:
+        _queue.put_nowait(QueuedPosition(
+            dev_eui=dev_eui.upper(),
+            time=datetime.now(timezone.utc),
+            lat=lat,
+            lng=lng,
+            rssi=rssi,
+            snr=snr,
+            gps_valid=gps_valid
+        ))
+        if _items_available is not None:
+            _items_available.set()
+        return True
+    except asyncio.QueueFull:
+        logger.warning("⚠️ Cola de posiciones llena, se descarta la posición de %s", dev_eui)
+        return False
+
+async def _wait_for_items(timeout: Optional[float] = None) -> bool:
+    """Espera el aviso de enqueue_position; False si se cumple el timeout."""
+    _items_available.clear()
+    try:
+        await asyncio.wait_for(_items_available.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+async def _collect_batch() -> List[QueuedPosition]:
+    """
+    Espera la primera posición y luego junta más hasta MAX_BATCH_SIZE o hasta que
+    pasen MAX_BATCH_WAIT segundos, para que uplinks casi simultáneos vayan en el mismo INSERT.
+    Retorna una lista vacía solo al apagar, con la cola ya vacía.
+    """
+    while _queue.empty():
+        if _shutting_down:
+            return []
+        await _wait_for_items()
+
+    loop = asyncio.get_running_loop()
+    items = [_queue.get_nowait()]
+    deadline = loop.time() + MAX_BATCH_WAIT
+    while len(items) < MAX_BATCH_SIZE:
+        if not _queue.empty():
+            items.append(_queue.get_nowait())
+            continue
+        remaining = deadline - loop.time()
+        if _shutting_down or remaining <= 0 or not await _wait_for_items(remaining):
+            break
+    return items
+
+def start_worker() -> "asyncio.Task[None]":
+    """
+    Arranca el worker en el loop actual. El aviso y la bandera de apagado se crean de
+    nuevo en cada arranque: un Event queda ligado al loop en que se esperó, y un apagado
+    anterior (otro lifespan en el mismo proceso) deja _shutting_down en True.
+    """
+    global _items_available, _shutting_down
+    _items_available = asyncio.Event()
+    _shutting_down = False
+    return asyncio.create_task(position_worker())
+
+async def position_worker():
+    """
+    Vacía la cola en lotes de hasta MAX_BATCH_SIZE posiciones y los guarda
+    con un único INSERT multi-fila. Termina cuando stop_worker() lo pide y la cola quedó vacía.
+    """
+    while True:
+        items = await _collect_batch()
+        if not items:
+            return
+
+        try:
+            await _store_positions(items)
+        except Exception:
+            logger.exception("❌ Error guardando lote de %d posiciones", len(items))
+            if len(items) > 1:
+                await _store_positions_one_by_one(items)
+
+async def _store_positions_one_by_one(items: List[QueuedPosition]):
+    """Reintenta un lote fallido fila por fila, para perder solo las posiciones con problemas."""
+    for item in items:
+        try:
+            await _store_positions([item])
+        except Exception:
+            logger.exception("❌ Error guardando la posición de %s (%s)", item.dev_eui, item.time.isoformat())
+
+async def stop_worker(worker: "asyncio.Task[None]"):
+    """
+    Apaga el worker sin descartar posiciones: termina el lote en curso y guarda lo que
+    quede en la cola. Si no alcanza en SHUTDOWN_TIMEOUT segundos, se cancela.
+    """
+    global _shutting_down
+    _shutting_down = True
+    _items_available.set()
+    try:
+        await asyncio.wait_for(worker, timeout=SHUTDOWN_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("⚠️ Apagado: se descartan %d posiciones sin guardar", _queue.qsize())
+
+async def _store_positions(items: List[QueuedPosition]):
+    async with SessionLocal() as db:
+        devices_result = await db.execute(
+            select(Device)
+            .options(selectinload(Device.groups))
+            .where(Device.dev_eui.in_({item.dev_eui for item in items}))
+        )
+        devices = {device.dev_eui: device for device in devices_result.scalars()}
+
+        # Geocercas activas de todos los grupos del lote, en una sola consulta
+        geofences_by_group = await device_service.get_active_geofences_by_group(
+            db, (group.id for device in devices.values() for group in device.groups)
+        )
+
+        positions = []
+        # Círculos por evaluar juntos al final: (índice en positions, device_id, lat, lng, geocerca)
+        pending_circles = []
+        for item in items:
+            device = devices.get(item.dev_eui)
+            if device is None:
+                logger.warning("⚠️ Posición de dispositivo no registrado: %s", item.dev_eui)
+                continue
+
+            inside_geofence = None
+            if item.gps_valid and item.lat != 0.0 and item.lng != 0.0:
+                geofence = device_service.get_first_active_geofence(device, geofences_by_group)
+                if geofence is not None and device_service.is_circle_geofence(geofence):
+                    is_stationary, inside_geofence = await geofence_cache.get_stationary_result(
+                        device.id, geofence, item.lat, item.lng
+                    )
+                    if not is_stationary:
+                        pending_circles.append((len(positions), device.id, item.lat, item.lng, geofence))
+                else:
+                    inside_geofence = await device_service.get_inside_geofence(
+                        db, device, item.lat, item.lng, geofences_by_group
+                    )
+
+            # model_construct: los datos ya vienen decodificados, no hace falta revalidarlos
+            positions.append((
+                PositionCreate.model_construct(
+                    device_id=device.id,
+                    time=item.time,
+                    latitude=item.lat,
+                    longitude=item.lng,
+                    rssi=item.rssi,
+                    snr=item.snr
+                ),
+                inside_geofence
+            ))
+
+        if pending_circles:
+            await _evaluate_circles(positions, pending_circles)
+
+        if positions:
+            await position_service.create_device_positions_bulk(db, positions)
+            logger.debug("💾 %d posiciones guardadas", len(positions))
+
+async def _evaluate_circles(positions: list, pending_circles: list):
+    """
+    Evalúa todas las posiciones del lote con geocerca circular en una sola
+    pasada vectorizada y completa inside_geofence en `positions`.
+    """
+    centers = {}
+    for _, _, _, _, geofence in pending_circles:
+        if geofence.id not in centers:
+            centers[geofence.id] = geofence_geometry.circle_center(geofence)
+
+    inside_flags = geofence_geometry.points_in_circles(
+        [lat for _, _, lat, _, _ in pending_circles],
+        [lng for _, _, _, lng, _ in pending_circles],
+        [centers[geofence.id][0] for *_, geofence in pending_circles],
+        [centers[geofence.id][1] for *_, geofence in pending_circles],
+        [geofence.radius for *_, geofence in pending_circles]
+    )
+
+    for (index, device_id, lat, lng, geofence), inside in zip(pending_circles, inside_flags.tolist()):
+        positions[index] = (positions[index][0], inside)
+        await geofence_cache.store_result(device_id, geofence, lat, lng, inside)
@@ -1,33 +1,222 @@
+import struct
+import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List, Optional
-from datetime import date
-from sqlalchemy import func
+from typing import AsyncIterator, List, Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import cast, literal, insert, func, bindparam, Date, DateTime, LargeBinary
+from sqlalchemy.engine import Row
+from geoalchemy2 import Geometry
+from geoalchemy2.elements import WKBElement
 
 from app.models.position import DevicePosition
 from app.schemas.position import PositionCreate
 
+# EWKB de un punto: [orden=1 little endian][tipo Point con flag SRID][srid][x=lng][y=lat]
+_EWKB_POINT_STRUCT = struct.Struct('<BIIdd')
+_EWKB_POINT_WITH_SRID = 0x20000001
+
+# location se envía como EWKB binario: PostGIS lo lee directo, sin parsear texto WKT por fila
+_INSERT_POSITION = insert(DevicePosition).values(
+    location=func.ST_GeogFromWKB(bindparam("location_ewkb", type_=LargeBinary))
+)
+
+# Layout de cada tupla del COPY binario de get_positions_ndarray: [n campos:2] y por
+# campo [largo:4][valor] en big-endian. Un NULL sería largo -1 sin valor y correría todas
+# las tuplas siguientes, así que la consulta no deja ninguno: descarta las filas sin
+# location y pasa rssi/snr nulos a NaN. Así todas las tuplas miden lo mismo y el
+# buffer se puede leer entero con frombuffer (_positions_from_copy igual lo verifica).
+_COPY_HEADER_SIZE = 19   # firma PGCOPY (11) + flags (4) + largo de extensión (4)
+_COPY_TRAILER_SIZE = 2   # marca de fin (-1 como int16)
+_COPY_POSITION_DTYPE = np.dtype([
+    ('nfields', '>i2'),
+    ('t_len', '>i4'), ('t', '>f8'),
+    ('lng_len', '>i4'), ('lng', '>f8'),
+    ('lat_len', '>i4'), ('lat', '>f8'),
+    ('rssi_len', '>i4'), ('rssi', '>f4'),
+    ('snr_len', '>i4'), ('snr', '>f4')
+])
+# Largo que debe traer cada campo (un NULL traería -1)
+_COPY_FIELD_SIZES = {'t_len': 8, 'lng_len': 8, 'lat_len': 8, 'rssi_len': 4, 'snr_len': 4}
+POSITION_ARRAY_DTYPE = np.dtype([
+    ('t', '<f8'),      # epoch en segundos
+    ('lng', '<f8'),
+    ('lat', '<f8'),
+    ('rssi', '<f4'),   # NaN si no vino
+    ('snr', '<f4')     # NaN si no vino
+])
+
+_POSITIONS_COPY_SQL = """
+    SELECT extract(epoch FROM time)::float8,
+           ST_X(location::geometry)::float8,
+           ST_Y(location::geometry)::float8,
+           COALESCE(rssi::float4, 'NaN'::float4),
+           COALESCE(snr::float4, 'NaN'::float4)
+    FROM device_positions
+    WHERE device_id = $1 AND time >= $2 AND location IS NOT NULL
+    ORDER BY time
+"""
+
+def _point_ewkb(lng: float, lat: float) -> bytes:
+    return _EWKB_POINT_STRUCT.pack(1, _EWKB_POINT_WITH_SRID, 4326, lng, lat)
+
 async def create_device_position(db: AsyncSession, position_in: PositionCreate, is_inside: Optional[bool]) -> DevicePosition:
-    wkt_location = f'POINT({position_in.longitude} {position_in.latitude})'
-    db_position = DevicePosition(
-        device_id=position_in.device_id,
-        location=wkt_location,
-        rssi=position_in.rssi,
-        snr=position_in.snr,
-        inside_geofence=is_inside
+    location_ewkb = _point_ewkb(position_in.longitude, position_in.latitude)
+    values = {
+        "device_id": position_in.device_id,
+        "rssi": position_in.rssi,
+        "snr": position_in.snr,
+        "inside_geofence": is_inside
+    }
+    if position_in.time is not None:
+        values["time"] = position_in.time
+
+    # RETURNING trae el tiempo asignado por la BD en el mismo round-trip (sin refresh posterior)
+    result = await db.execute(
+        _INSERT_POSITION.returning(DevicePosition.time),
+        {**values, "location_ewkb": location_ewkb}
+    )
+    inserted_time = result.scalar_one()
+    await db.commit()
+
+    values["time"] = inserted_time
+    values["location"] = WKBElement(location_ewkb, srid=4326, extended=True)
+    return DevicePosition(**values)
+
+async def create_device_positions_bulk(db: AsyncSession, items: List[Tuple[PositionCreate, Optional[bool]]]) -> List[Tuple[datetime, int]]:
+    """
+    Inserta varias posiciones con un único INSERT multi-fila y un solo commit.
+    Cada item es (posición, inside_geofence). Retorna la PK (time, device_id) de cada fila.
+    """
+    if not items:
+        return []
+
+    values = [
+        {
+            # El tiempo se fija por fila: con now() todas las filas del lote tendrían el mismo
+            # tiempo de transacción y chocarían en la PK si un dispositivo trae dos posiciones
+            "time": position.time or datetime.now(timezone.utc),
+            "device_id": position.device_id,
+            "location_ewkb": _point_ewkb(position.longitude, position.latitude),
+            "rssi": position.rssi,
+            "snr": position.snr,
+            "inside_geofence": is_inside
+        }
+        for position, is_inside in items
+    ]
+    result = await db.execute(
+        _INSERT_POSITION.returning(DevicePosition.time, DevicePosition.device_id),
+        values
     )
-    db.add(db_position)
+    inserted = [tuple(row) for row in result]
     await db.commit()
-    await db.refresh(db_position)
-    return db_position
+    return inserted
 
-async def get_device_positions(db: AsyncSession, device_id: int, a_date: Optional[date] = None) -> List[DevicePosition]:
-    query = select(DevicePosition).where(DevicePosition.device_id == device_id)
+async def get_device_positions(db: AsyncSession, device_id: int, a_date: Optional[date] = None) -> AsyncIterator[Row]:
+    """
+    Historial del dispositivo (hasta 1000 posiciones, más recientes primero) como
+    iterador asíncrono: las filas se entregan a medida que llegan del servidor, sin
+    armar la lista completa en memoria.
+    Camino de historial/exportación: retorna filas de columnas sueltas
+    (time, latitude, longitude, rssi, snr, inside_geofence), no objetos ORM.
+    """
+    location_geometry = cast(DevicePosition.location, Geometry(srid=4326))
+    query = select(
+        DevicePosition.time,
+        func.ST_Y(location_geometry).label("latitude"),
+        func.ST_X(location_geometry).label("longitude"),
+        DevicePosition.rssi,
+        DevicePosition.snr,
+        DevicePosition.inside_geofence
+    ).where(DevicePosition.device_id == device_id)
     if a_date:
-        query = query.where(func.date(DevicePosition.time) == a_date)
+        # Rango [día, día + 1) sobre la columna sin envolverla en date(), para que use el
+        # índice (device_id, time DESC). Los límites se castean en la zona horaria de la
+        # sesión, igual que lo hacía date(time).
+        day_start = cast(literal(a_date, Date), DateTime(timezone=True))
+        day_end = cast(literal(a_date + timedelta(days=1), Date), DateTime(timezone=True))
+        query = query.where(DevicePosition.time >= day_start, DevicePosition.time < day_end)
     query = query.order_by(DevicePosition.time.desc()).limit(1000)
-    result = await db.execute(query)
-    return result.scalars().all()
+    async for row in await db.stream(query):
+        yield row
+
+_COPY_COLUMNS = ['time', 'device_id', 'location', 'rssi', 'snr', 'inside_geofence']
+
+async def bulk_copy_positions(db: AsyncSession, items: List[Tuple[PositionCreate, Optional[bool]]]) -> int:
+    """
+    Carga masiva (reproceso de uplinks, migraciones) con COPY FROM STDIN binario de
+    asyncpg, mucho más rápido que INSERT incluso en lotes. Cada item es
+    (posición, inside_geofence), igual que en create_device_positions_bulk.
+    Retorna la cantidad de filas copiadas.
+    """
+    if not items:
+        return 0
+
+    connection = await db.connection()
+    raw_connection = (await connection.get_raw_connection()).driver_connection
+
+    records = (
+        (
+            position.time or datetime.now(timezone.utc),
+            position.device_id,
+            _point_ewkb(position.longitude, position.latitude),
+            position.rssi,
+            position.snr,
+            is_inside
+        )
+        for position, is_inside in items
+    )
+
+    # asyncpg no trae codec binario para geography: durante el COPY se envía el EWKB
+    # tal cual (geography_recv lo acepta) y luego se deja el codec como estaba
+    await raw_connection.set_type_codec(
+        'geography', schema='public', encoder=bytes, decoder=bytes, format='binary'
+    )
+    try:
+        await raw_connection.copy_records_to_table('device_positions', records=records, columns=_COPY_COLUMNS)
+    finally:
+        await raw_connection.reset_type_codec('geography', schema='public')
+
+    await db.commit()
+    return len(items)
+
+def _positions_from_copy(buffer: bytes) -> np.ndarray:
+    """Convierte la salida del COPY binario en un arreglo estructurado POSITION_ARRAY_DTYPE."""
+    body_size = len(buffer) - _COPY_HEADER_SIZE - _COPY_TRAILER_SIZE
+    if body_size <= 0:
+        return np.empty(0, dtype=POSITION_ARRAY_DTYPE)
+
+    count, remainder = divmod(body_size, _COPY_POSITION_DTYPE.itemsize)
+    if remainder:
+        raise ValueError("COPY binario con tuplas de largo variable (¿algún NULL?)")
+
+    tuples = np.frombuffer(buffer, dtype=_COPY_POSITION_DTYPE, count=count, offset=_COPY_HEADER_SIZE)
+    for field, size in _COPY_FIELD_SIZES.items():
+        if (tuples[field] != size).any():
+            raise ValueError(f"COPY binario con largo inesperado en {field} (¿algún NULL?)")
+    positions = np.empty(len(tuples), dtype=POSITION_ARRAY_DTYPE)
+    for field in POSITION_ARRAY_DTYPE.names:
+        positions[field] = tuples[field]
+    return positions
+
+async def get_positions_ndarray(db: AsyncSession, device_id: int, since: datetime) -> np.ndarray:
+    """
+    Posiciones del dispositivo desde `since` (en orden cronológico) como un arreglo
+    estructurado de NumPy, para análisis vectorizados (mapas de calor, trayectos).
+    Las filas llegan por COPY binario de asyncpg a un solo buffer, sin crear un
+    objeto de Python por fila.
+    """
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+
+    buffer = bytearray()
+    async def _collect(chunk):
+        buffer.extend(chunk)
+
+    await raw_connection.driver_connection.copy_from_query(
+        _POSITIONS_COPY_SQL, device_id, since, output=_collect, format='binary'
+    )
+    return _positions_from_copy(bytes(buffer))
 
 async def get_latest_position_for_device(db: AsyncSession, device_id: int) -> Optional[DevicePosition]:
     query = select(DevicePosition).where(DevicePosition.device_id == device_id).order_by(DevicePosition.time.desc()).limit(1)
@@ -1,19 +1,40 @@
 # recreate_db.py
 import asyncio
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine
 from app.core.database import Base, DATABASE_URL
 from app.models import device, group, geofence, position # Asegura que todos los modelos son importados
 
+# Reset completo del esquema (solo desarrollo): borra todo lo que haya en public de una vez,
+# en lugar de un DROP TABLE por tabla. asyncpg no acepta varias sentencias en un execute.
+#
+# Privilegios: el usuario de DATABASE_URL debe ser dueño del esquema public (DROP SCHEMA)
+# y superusuario, porque el CASCADE también elimina la extensión postgis y volver a
+# crearla lo exige. Si no los tiene, la transacción falla y el esquema queda como estaba.
+# El esquema nuevo pertenece a ese usuario; los GRANT/COMMENT reponen lo que trae el
+# public por defecto para que los demás roles sigan pudiendo usarlo.
+_RESET_SCHEMA_SQL = (
+    "DROP SCHEMA IF EXISTS public CASCADE",
+    "CREATE SCHEMA public",
+    "GRANT USAGE ON SCHEMA public TO PUBLIC",
+    "COMMENT ON SCHEMA public IS 'standard public schema'",
+    "CREATE EXTENSION IF NOT EXISTS postgis",
+)
+
 async def recreate_database():
     print("Conectando a la base de datos para reconstruir el esquema...")
     engine = create_async_engine(DATABASE_URL)
     
+    # Todo en una transacción: si algo falla, el esquema anterior queda intacto
     async with engine.begin() as conn:
-        print("Eliminando todas las tablas existentes...")
-        await conn.run_sync(Base.metadata.drop_all)
+        print("Eliminando el esquema existente...")
+        for statement in _RESET_SCHEMA_SQL:
+            await conn.execute(text(statement))
+        # create_all también crea los índices declarados en los modelos (SP-GiST y device_id+time)
         print("Creando todas las tablas...")
         await conn.run_sync(Base.metadata.create_all)
     
+    await engine.dispose()
     print("¡Esquema de base de datos reconstruido con éxito!")
 
 if __name__ == "__main__":
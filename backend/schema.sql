@@ -5,5 +5,6 @@ CREATE TABLE device_group_members (device_id INTEGER REFERENCES devices(id) ON D
 CREATE TABLE geofences (id SERIAL PRIMARY KEY, group_id INTEGER REFERENCES device_groups(id) ON DELETE CASCADE, name VARCHAR(100) NOT NULL, geofence_type VARCHAR(20) NOT NULL, geometry GEOGRAPHY NOT NULL, radius REAL, active BOOLEAN DEFAULT true);
 CREATE TABLE device_positions (time TIMESTAMP WITH TIME ZONE NOT NULL, device_id INTEGER REFERENCES devices(id) ON DELETE CASCADE, location GEOGRAPHY(POINT, 4326) NOT NULL, rssi INTEGER, snr REAL, inside_geofence BOOLEAN, PRIMARY KEY (time, device_id));
 CREATE INDEX idx_positions_time ON device_positions (time DESC);
-CREATE INDEX idx_positions_location ON device_positions USING GIST(location);
+CREATE INDEX ix_device_positions_location_spgist ON device_positions USING SPGIST(location);
+CREATE INDEX ix_device_positions_device_time ON device_positions (device_id, time DESC);
 CREATE INDEX idx_geofences_geometry ON geofences USING GIST(geometry);
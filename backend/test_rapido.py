@@ -1,68 +1,82 @@
 #!/usr/bin/env python3
-import requests
-import json
+import asyncio
+import httpx
+import orjson
 import time
 
 BACKEND_URL = "http://localhost:8002"
 DEVICE_EUI = "000048CA433CEC58"  # Tu DevEUI
 
-print("🔍 1. Verificando conexión con ChirpStack...")
-r = requests.get(f"{BACKEND_URL}/api/integrations/test-connection")
-print(json.dumps(r.json(), indent=2))
+async def main():
+    # Un solo cliente: todas las llamadas reutilizan la conexión con el backend
+    async with httpx.AsyncClient(base_url=BACKEND_URL, timeout=10) as client:
+        print("🔍 1. Verificando conexión con ChirpStack...")
+        r = await client.get("/api/integrations/test-connection")
+        connection = orjson.loads(r.content)
+        print(orjson.dumps(connection, option=orjson.OPT_INDENT_2).decode())
 
-if r.json().get("status") != "connected":
-    print("❌ Error de conexión. Verifica el backend.")
-    exit(1)
+        if connection.get("status") != "connected":
+            print("❌ Error de conexión. Verifica el backend.")
+            exit(1)
 
-print("\n✅ Conexión OK!")
+        print("\n✅ Conexión OK!")
 
-print("\n🔔 2. Probando buzzer (3 segundos)...")
-r = requests.post(f"{BACKEND_URL}/api/integrations/test-buzzer/{DEVICE_EUI}?duration=3")
-if r.status_code == 200:
-    print("✅ Buzzer enviado")
-else:
-    print(f"❌ Error: {r.text}")
+        # La consulta de grupos es solo lectura: va en paralelo con el buzzer
+        print("\n🔔 2. Probando buzzer (3 segundos)...")
+        buzzer, groups_response = await asyncio.gather(
+            client.post(f"/api/integrations/test-buzzer/{DEVICE_EUI}", params={"duration": 3}),
+            client.get("/api/v1/groups/")
+        )
+        if buzzer.status_code == 200:
+            print("✅ Buzzer enviado")
+        else:
+            print(f"❌ Error: {buzzer.text}")
 
-time.sleep(2)
+        await asyncio.sleep(2)
 
-print("\n📍 3. Enviando geocerca de prueba...")
-params = {"lat": -37.346403, "lng": -72.914955, "radius": 150}
-r = requests.post(f"{BACKEND_URL}/api/integrations/send-geofence/{DEVICE_EUI}", params=params)
-if r.status_code == 200:
-    print("✅ Geocerca enviada")
-    print(f"   Centro: {params['lat']}, {params['lng']}")
-    print(f"   Radio: {params['radius']}m")
-else:
-    print(f"❌ Error: {r.text}")
+        print("\n📍 3. Enviando geocerca de prueba...")
+        # Los pasos 3 y 4 encolan downlinks al mismo dispositivo: van en orden, no en paralelo
+        params = {"lat": -37.346403, "lng": -72.914955, "radius": 150}
+        r = await client.post(f"/api/integrations/send-geofence/{DEVICE_EUI}", params=params)
+        if r.status_code == 200:
+            print("✅ Geocerca enviada")
+            print(f"   Centro: {params['lat']}, {params['lng']}")
+            print(f"   Radio: {params['radius']}m")
+        else:
+            print(f"❌ Error: {r.text}")
 
-print("\n📊 4. Creando geocerca con envío automático...")
-# Obtener grupos
-r = requests.get(f"{BACKEND_URL}/api/v1/groups/")
-if r.status_code == 200 and r.json():
-    group_id = r.json()[0]["id"]
-    print(f"   Usando grupo ID: {group_id}")
-    
-    # Crear geocerca
-    geofence_data = {
-        "group_id": group_id,
-        "name": f"Test Auto {time.strftime('%H:%M:%S')}",
-        "geofence_type": "circle",
-        "coordinates": {"lat": -37.346403, "lng": -72.914955, "radius": 200},
-        "active": True
-    }
-    
-    r = requests.post(f"{BACKEND_URL}/api/v1/geofences/", json=geofence_data)
-    if r.status_code == 201:
-        print("✅ Geocerca creada - downlinks enviados automáticamente")
-    else:
-        print(f"❌ Error: {r.text}")
-else:
-    print("❌ No hay grupos disponibles")
+        print("\n📊 4. Creando geocerca con envío automático...")
+        groups = orjson.loads(groups_response.content) if groups_response.status_code == 200 else []
+        if groups:
+            group_id = groups[0]["id"]
+            print(f"   Usando grupo ID: {group_id}")
 
-print("\n" + "="*50)
-print("✅ PRUEBA COMPLETADA")
-print("Verifica en la ESP32:")
-print("  - El contador RX debe incrementarse")
-print("  - El buzzer debe sonar")
-print("  - Los logs deben mostrar 'GEOCERCA RECIBIDA'")
-print("="*50)
+            geofence_data = {
+                "group_id": group_id,
+                "name": f"Test Auto {time.strftime('%H:%M:%S')}",
+                "geofence_type": "circle",
+                "coordinates": {"lat": -37.346403, "lng": -72.914955, "radius": 200},
+                "active": True
+            }
+            r = await client.post(
+                "/api/v1/geofences/",
+                content=orjson.dumps(geofence_data),
+                headers={"Content-Type": "application/json"}
+            )
+            if r.status_code == 201:
+                print("✅ Geocerca creada - downlinks enviados automáticamente")
+            else:
+                print(f"❌ Error: {r.text}")
+        else:
+            print("❌ No hay grupos disponibles")
+
+    print("\n" + "="*50)
+    print("✅ PRUEBA COMPLETADA")
+    print("Verifica en la ESP32:")
+    print("  - El contador RX debe incrementarse")
+    print("  - El buzzer debe sonar")
+    print("  - Los logs deben mostrar 'GEOCERCA RECIBIDA'")
+    print("="*50)
+
+if __name__ == "__main__":
+    asyncio.run(main())
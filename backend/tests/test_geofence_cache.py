@@ -0,0 +1,30 @@
+"""Reutilización de la evaluación de geocerca para dispositivos detenidos."""
+import asyncio
+from types import SimpleNamespace
+
+from app.services import geofence_cache
+
+
+def circle(radius, wkb=b"\x01\x01"):
+    return SimpleNamespace(id=7, geofence_type="circle", radius=radius, geometry=SimpleNamespace(data=wkb))
+
+
+def test_stationary_device_reuses_result_for_same_geofence():
+    async def run():
+        await geofence_cache.store_result(1, circle(100), -37.3, -72.9, True)
+        return await geofence_cache.get_stationary_result(1, circle(100), -37.30001, -72.9)
+
+    assert asyncio.run(run()) == (True, True)
+
+
+def test_result_stored_against_an_edited_geofence_is_ignored():
+    async def run():
+        # Resultado de una evaluación que empezó antes de editar la geocerca
+        await geofence_cache.invalidate()
+        await geofence_cache.store_result(1, circle(100), -37.3, -72.9, True)
+        return (
+            await geofence_cache.get_stationary_result(1, circle(50), -37.3, -72.9),
+            await geofence_cache.get_stationary_result(1, circle(100, b"\x01\x02"), -37.3, -72.9),
+        )
+
+    assert asyncio.run(run()) == ((False, None), (False, None))
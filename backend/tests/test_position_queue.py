@@ -0,0 +1,105 @@
+"""Lotes y apagado del worker de posiciones, sin base de datos."""
+import asyncio
+import logging
+
+import pytest
+
+from app.services import position_queue
+
+
+@pytest.fixture
+def stored_batches(monkeypatch):
+    """Reemplaza el INSERT por una lista con los dev_eui de cada lote guardado."""
+    batches = []
+
+    async def fake_store(items):
+        batches.append([item.dev_eui for item in items])
+
+    monkeypatch.setattr(position_queue, "_store_positions", fake_store)
+    yield batches
+    while not position_queue._queue.empty():
+        position_queue._queue.get_nowait()
+
+
+def enqueue(*dev_euis):
+    for dev_eui in dev_euis:
+        assert position_queue.enqueue_position(dev_eui, -37.3, -72.9, -40, 9.5, True)
+
+
+def test_queued_positions_go_in_one_batch(stored_batches):
+    async def run():
+        enqueue("a", "b", "c")
+        worker = position_queue.start_worker()
+        await position_queue.stop_worker(worker)
+
+    asyncio.run(run())
+    assert stored_batches == [["A", "B", "C"]]
+
+
+def test_batches_are_capped_and_drained_on_shutdown(stored_batches, monkeypatch):
+    monkeypatch.setattr(position_queue, "MAX_BATCH_SIZE", 2)
+
+    async def run():
+        enqueue("a", "b", "c", "d", "e")
+        worker = position_queue.start_worker()
+        await position_queue.stop_worker(worker)
+
+    asyncio.run(run())
+    assert stored_batches == [["A", "B"], ["C", "D"], ["E"]]
+
+
+def test_worker_lingers_for_close_uplinks(stored_batches, monkeypatch):
+    monkeypatch.setattr(position_queue, "MAX_BATCH_WAIT", 5.0)
+
+    async def run():
+        worker = position_queue.start_worker()
+        enqueue("a")
+        await asyncio.sleep(0.01)
+        enqueue("b")
+        await asyncio.sleep(0.01)
+        assert stored_batches == []
+        await position_queue.stop_worker(worker)
+
+    asyncio.run(run())
+    assert stored_batches == [["A", "B"]]
+
+
+def test_worker_restarts_after_a_previous_shutdown(stored_batches):
+    async def run(dev_eui):
+        worker = position_queue.start_worker()
+        await asyncio.sleep(0.01)
+        enqueue(dev_eui)
+        await asyncio.sleep(0.2)
+        # Guardado por el worker en marcha, no por el vaciado del apagado
+        assert not worker.done()
+        assert stored_batches[-1] == [dev_eui.upper()]
+        await position_queue.stop_worker(worker)
+
+    # Cada asyncio.run es un loop nuevo, como dos lifespans en el mismo proceso
+    asyncio.run(run("a"))
+    asyncio.run(run("b"))
+    assert stored_batches == [["A"], ["B"]]
+
+
+def test_failed_batch_is_retried_row_by_row(monkeypatch, caplog):
+    stored = []
+
+    async def failing_store(items):
+        if len(items) > 1 or items[0].dev_eui == "B":
+            raise RuntimeError("insert failed")
+        stored.append(items[0].dev_eui)
+
+    monkeypatch.setattr(position_queue, "_store_positions", failing_store)
+
+    async def run():
+        enqueue("a", "b", "c")
+        worker = position_queue.start_worker()
+        await position_queue.stop_worker(worker)
+
+    with caplog.at_level(logging.ERROR, logger=position_queue.logger.name):
+        asyncio.run(run())
+
+    assert stored == ["A", "C"]
+    errors = [record for record in caplog.records if record.levelno == logging.ERROR]
+    assert len(errors) == 2
+    assert all(record.exc_info for record in errors)
@@ -0,0 +1,127 @@
+"""Webhook de uplink con eventos reales de ChirpStack v3 y v4."""
+import base64
+import struct
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import integrations
+from app.dependencies import get_db
+from app.main import app
+
+# [lat:4][lng:4][alt:2][alerta:1][batería:1]
+GPS_PAYLOAD = base64.b64encode(struct.pack('<ffHBB', -37.346403, -72.914955, 120, 0, 87)).decode()
+
+CHIRPSTACK_V4_UPLINK = {
+    "deduplicationId": "3ac7e3c4-4401-4b8d-9386-a5c902f9202d",
+    "time": "2022-07-18T09:34:15.775023242+00:00",
+    "deviceInfo": {
+        "tenantId": "52f14cd4-c6f1-4fbd-8f87-4025e1d49242",
+        "tenantName": "ChirpStack",
+        "applicationId": "17c82e96-be03-4f38-aef3-f83d48582d97",
+        "applicationName": "Test application",
+        "deviceProfileId": "14855bf7-d10d-4aee-b618-ebfcb64dc7ad",
+        "deviceProfileName": "Test device-profile",
+        "deviceName": "Test device",
+        "devEui": "0101010101010101",
+        "deviceClassEnabled": "CLASS_A",
+        "tags": {"key": "value"}
+    },
+    "devAddr": "00189440",
+    "adr": True,
+    "dr": 1,
+    "fCnt": 4,
+    "fPort": 1,
+    "confirmed": False,
+    "data": GPS_PAYLOAD,
+    "object": {"latitude": -37.346403, "longitude": -72.914955},
+    "rxInfo": [{
+        "gatewayId": "0016c001f153a14c",
+        "uplinkId": 4217106255,
+        "rssi": -36,
+        "snr": 10.5,
+        "channel": 2,
+        "location": {"latitude": -37.3, "longitude": -72.9},
+        "context": "E3OWOQ==",
+        "metadata": {"region_config_id": "au915_1", "region_common_name": "AU915"},
+        "crcStatus": "CRC_OK"
+    }],
+    "txInfo": {
+        "frequency": 917200000,
+        "modulation": {"lora": {"bandwidth": 125000, "spreadingFactor": 10, "codeRate": "CR_4_5"}}
+    }
+}
+
+CHIRPSTACK_V3_UPLINK = {
+    "applicationID": "1",
+    "applicationName": "collares",
+    "deviceName": "collar-01",
+    "devEUI": "AABIykM87Fg=",
+    "rxInfo": [{
+        "gatewayID": "AwMDAwMDAwM=",
+        "time": "2019-11-08T13:59:25.048445Z",
+        "timeSinceGPSEpoch": None,
+        "rssi": -48,
+        "loRaSNR": 9,
+        "channel": 5,
+        "rfChain": 0,
+        "board": 0,
+        "antenna": 0,
+        "location": {"latitude": -37.3, "longitude": -72.9, "altitude": 10.5},
+        "fineTimestampType": "NONE",
+        "context": "9u/uvA==",
+        "uplinkID": "jhMh8Gq6RAOChSKbi83RHQ=="
+    }],
+    "txInfo": {
+        "frequency": 917200000,
+        "modulation": "LORA",
+        "loRaModulationInfo": {"bandwidth": 125, "spreadingFactor": 10, "codeRate": "4/5", "polarizationInversion": False}
+    },
+    "adr": True,
+    "dr": 2,
+    "fCnt": 10,
+    "fPort": 1,
+    "data": GPS_PAYLOAD,
+    "objectJSON": "{\"latitude\":-37.346403}",
+    "tags": {"key": "value"}
+}
+
+@pytest.fixture
+def client(monkeypatch):
+    enqueued = []
+    monkeypatch.setattr(
+        integrations.position_queue, "enqueue_position",
+        lambda *args, **kwargs: enqueued.append((args, kwargs)) or True
+    )
+
+    async def no_db():
+        yield None
+
+    app.dependency_overrides[get_db] = no_db
+    yield TestClient(app), enqueued
+    app.dependency_overrides.clear()
+
+@pytest.mark.parametrize("body, dev_eui, snr", [
+    (CHIRPSTACK_V4_UPLINK, "0101010101010101", 10.5),
+    (CHIRPSTACK_V3_UPLINK, "000048ca433cec58", 9.0),
+])
+def test_gps_uplink_is_enqueued(client, body, dev_eui, snr):
+    test_client, enqueued = client
+    response = test_client.post("/api/integrations/webhook/uplink", json=body)
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "device": dev_eui}
+    assert len(enqueued) == 1
+    (eui, lat, lng, rssi, uplink_snr), _ = enqueued[0]
+    assert eui == dev_eui
+    assert lat == pytest.approx(-37.346403, abs=1e-5)
+    assert lng == pytest.approx(-72.914955, abs=1e-5)
+    assert rssi == body["rxInfo"][0]["rssi"]
+    assert uplink_snr == snr
+
+def test_malformed_uplink_is_rejected(client):
+    test_client, enqueued = client
+    response = test_client.post("/api/integrations/webhook/uplink", json={"fPort": "gps"})
+
+    assert response.status_code == 422
+    assert enqueued == []